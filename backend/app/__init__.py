@@ -2,15 +2,19 @@ from flask import Flask, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import json
 from dotenv import load_dotenv
+from .admission import AdmissionController
 
 load_dotenv()
 
 db = SQLAlchemy()
 login_manager = LoginManager()
+admission_control = AdmissionController()
 
-def create_app():
+def create_app(config=None):
     # 1. Update Flask to point to the React build folder
     # This assumes the structure: /backend/app/ and /frontend/client/dist/
     app = Flask(__name__, 
@@ -21,12 +25,33 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-this')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///openings.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Concurrency/rate limits for expensive and write endpoints (see admission.py for defaults)
+    app.config['ADMISSION_ENABLED'] = os.getenv('ADMISSION_ENABLED', '1') != '0'
+    # JSON overrides merged over the defaults, e.g. '{"export": 1}' / '{"login": [0.1, 3]}'
+    app.config['ADMISSION_CONCURRENCY'] = json.loads(os.getenv('ADMISSION_CONCURRENCY', '{}'))
+    app.config['ADMISSION_RATE_LIMITS'] = json.loads(os.getenv('ADMISSION_RATE_LIMITS', '{}'))
+    app.config['ADMISSION_RETRY_AFTER'] = int(os.getenv('ADMISSION_RETRY_AFTER', 5))
+    # Requests per group that may wait for a slot instead of getting a 429 at once
+    app.config['ADMISSION_QUEUE_SIZE'] = int(os.getenv('ADMISSION_QUEUE_SIZE', 0))
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 2))
+    app.config['ADMISSION_WORKER_THREADS'] = int(os.getenv('GUNICORN_THREADS', 4))
+
+    # Number of reverse proxies in front of the app. Guest rate limits key on the
+    # client IP, which is only the real one if X-Forwarded-For is trusted this many hops
+    trusted_proxies = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
+    # Explicit settings (e.g. tests) win over the environment
+    if config:
+        app.config.update(config)
     
     # CORS (Optional now since we are serving from same origin, but good to keep)
     CORS(app, resources={r"/api/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173"]}}, supports_credentials=True)
 
     db.init_app(app)
     login_manager.init_app(app)
+    admission_control.init_app(app)
 
     from .routes import api as api_blueprint
     from .auth_routes import auth as auth_blueprint
@@ -0,0 +1,206 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, request
+from flask_login import current_user
+
+# Defaults. app.config entries (set from the environment in create_app, or
+# passed to create_app) override them per group/bucket.
+# All limits are per worker process: with N gunicorn workers the site-wide
+# ceiling is N times these values.
+DEFAULT_CONCURRENCY = {
+    # endpoint group: max running per worker
+    'export_backup': 1,
+    'import': 1,
+    'export': 2,
+}
+DEFAULT_RATE_LIMITS = {
+    # bucket: (tokens per second, burst size)
+    'write': (5.0, 20),
+    'login': (0.2, 5),
+    'verify_admin': (0.2, 5),
+}
+MAX_TRACKED_CLIENTS = 10000 # per bucket; least recently seen clients are dropped beyond this
+
+class ConcurrencyLimit:
+    """
+    Semaphore with a bounded wait queue: up to queue_size requests wait at most
+    queue_timeout seconds for a slot, anything beyond that is rejected at once.
+    The default queue_size of 0 never ties up a worker thread waiting. An
+    optional shared limit caps all expensive groups together; it counts waiting
+    requests as well as running ones, since both hold a worker thread.
+    """
+
+    def __init__(self, max_running, shared=None, queue_size=0, queue_timeout=0):
+        self.semaphore = threading.BoundedSemaphore(max_running)
+        self.shared = shared
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.waiting_lock = threading.Lock()
+
+    def _acquire_own(self):
+        if self.semaphore.acquire(blocking=False):
+            return True
+        with self.waiting_lock:
+            if self.waiting >= self.queue_size:
+                return False
+            self.waiting += 1
+        try:
+            return self.semaphore.acquire(timeout=self.queue_timeout)
+        finally:
+            with self.waiting_lock:
+                self.waiting -= 1
+
+    def acquire(self):
+        if self.shared is not None and not self.shared.acquire():
+            return False
+        if not self._acquire_own():
+            if self.shared is not None:
+                self.shared.release()
+            return False
+        return True
+
+    def release(self):
+        self.semaphore.release()
+        if self.shared is not None:
+            self.shared.release()
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        """Consume one token. Returns 0 on success, otherwise seconds until one is available."""
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+class AdmissionController:
+    """
+    Keeps expensive endpoints from starving cheap reads.
+    - limit_concurrency(group): at most N requests of a group run at once, and
+      optionally a few more wait briefly (ADMISSION_QUEUE_SIZE, default 0). All
+      groups together, running and waiting, stay below the worker's thread count
+      so at least one thread is always left for reads; this needs >= 2 threads.
+    - rate_limit(bucket): per-user (or per-IP for guests) token buckets.
+    Rejections are 429 responses with a Retry-After header. State lives in the
+    worker process, so limits apply per worker.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ADMISSION_ENABLED', True)
+        # Merge into fresh dicts so config changes never leak into the module defaults
+        app.config['ADMISSION_CONCURRENCY'] = {
+            **DEFAULT_CONCURRENCY, **(app.config.get('ADMISSION_CONCURRENCY') or {})
+        }
+        app.config['ADMISSION_RATE_LIMITS'] = {
+            name: tuple(limit)
+            for name, limit in {**DEFAULT_RATE_LIMITS, **(app.config.get('ADMISSION_RATE_LIMITS') or {})}.items()
+        }
+        app.config.setdefault('ADMISSION_RETRY_AFTER', 5)
+        app.config.setdefault('ADMISSION_QUEUE_SIZE', 0)
+        app.config.setdefault('ADMISSION_QUEUE_TIMEOUT', 2.0)
+        # Same setting gunicorn.conf.py uses for threads per worker
+        app.config.setdefault('ADMISSION_WORKER_THREADS', int(os.getenv('GUNICORN_THREADS', 4)))
+
+        threads = app.config['ADMISSION_WORKER_THREADS']
+        if app.config['ADMISSION_ENABLED'] and threads < 2:
+            raise ValueError(
+                f"ADMISSION_WORKER_THREADS is {threads}; admission control needs at least 2 threads "
+                "per worker to keep one free for reads (set GUNICORN_THREADS >= 2, or ADMISSION_ENABLED=0)"
+            )
+
+        # Running plus waiting expensive requests never take the last thread
+        max_expensive = max(1, threads - 1)
+        shared = ConcurrencyLimit(max_expensive)
+        app.extensions['admission'] = {
+            'concurrency': {
+                group: ConcurrencyLimit(
+                    min(max_running, max_expensive), shared,
+                    app.config['ADMISSION_QUEUE_SIZE'], app.config['ADMISSION_QUEUE_TIMEOUT'],
+                )
+                for group, max_running in app.config['ADMISSION_CONCURRENCY'].items()
+            },
+            'buckets': {name: OrderedDict() for name in app.config['ADMISSION_RATE_LIMITS']},
+            'buckets_lock': threading.Lock(),
+        }
+
+    @staticmethod
+    def _too_many_requests(retry_after):
+        response = jsonify({'error': 'Too many requests, please retry later'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def limit_concurrency(self, group):
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not current_app.config['ADMISSION_ENABLED']:
+                    return view(*args, **kwargs)
+
+                limit = current_app.extensions['admission']['concurrency'][group]
+                if not limit.acquire():
+                    return self._too_many_requests(current_app.config['ADMISSION_RETRY_AFTER'])
+
+                try:
+                    response = current_app.make_response(view(*args, **kwargs))
+                except BaseException:
+                    limit.release()
+                    raise
+
+                if response.is_streamed:
+                    # Streamed bodies keep working after the view returns; hold the slot until sent
+                    response.call_on_close(limit.release)
+                else:
+                    limit.release()
+                return response
+            return wrapped
+        return decorator
+
+    def rate_limit(self, bucket_name):
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not current_app.config['ADMISSION_ENABLED']:
+                    return view(*args, **kwargs)
+
+                state = current_app.extensions['admission']
+                rate, burst = current_app.config['ADMISSION_RATE_LIMITS'][bucket_name]
+                client = f"u{current_user.id}" if current_user.is_authenticated else f"ip{request.remote_addr}"
+                now = time.monotonic()
+
+                with state['buckets_lock']:
+                    buckets = state['buckets'][bucket_name]
+                    # LRU order: the front holds the clients seen longest ago
+                    bucket = buckets.get(client)
+                    if bucket is None:
+                        bucket = buckets[client] = TokenBucket(rate, burst, now)
+                        if len(buckets) > MAX_TRACKED_CLIENTS:
+                            buckets.popitem(last=False)
+                    else:
+                        buckets.move_to_end(client)
+                    wait = bucket.take(now)
+
+                if wait:
+                    return self._too_many_requests(wait)
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
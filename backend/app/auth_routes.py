@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from flask_login import login_user, logout_user, login_required, current_user
 from .models import db, User
+from . import admission_control
 import os
 
 auth = Blueprint('auth', __name__)
@@ -26,6 +27,7 @@ def signup():
     return jsonify({'message': 'Registered successfully', 'user': {'id': new_user.id, 'username': new_user.username}})
 
 @auth.route('/login', methods=['POST'])
+@admission_control.rate_limit('login')
 def login():
     data = request.get_json()
     user = User.query.filter_by(username=data.get('username')).first()
@@ -72,6 +74,7 @@ def update_profile():
     return jsonify({'message': 'Profile updated successfully', 'user': {'id': user.id, 'username': user.username}})
 
 @auth.route('/verify-admin', methods=['POST'])
+@admission_control.rate_limit('verify_admin')
 def verify_admin():
     """Verify admin password for Guest mode editing"""
     data = request.get_json()
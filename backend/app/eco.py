@@ -0,0 +1,142 @@
+import bisect
+import csv
+import hashlib
+import os
+import pickle
+import re
+import threading
+
+# Bundled ECO table (eco, name, pgn) and the binary cache built from it.
+# The bundled table is a seed subset of common lines, see its header
+ECO_TABLE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'eco.tsv')
+ECO_CACHE_PATH = os.getenv('ECO_CACHE_PATH', os.path.join(os.path.dirname(__file__), 'data', 'eco.idx'))
+INDEX_VERSION = 2 # Bump when the cached structure changes
+
+# Trie nodes are plain dicts keyed by SAN move; this key holds the (eco, name) ending there
+_LEAF = ''
+
+_index = None
+_index_lock = threading.Lock()
+
+_COMMENT_RE = re.compile(r'\{[^}]*\}|\([^)]*\)|;[^\n]*')
+_MOVE_NUMBER_RE = re.compile(r'^\d+\.+')
+_RESULTS = {'1-0', '0-1', '1/2-1/2', '*'}
+
+def tokenize_moves(moves):
+    """
+    Turn free-text PGN movetext ("1.e4 e5 2. Nf3 {note} Nc6+!") into bare SAN tokens.
+    Check/annotation marks are dropped so user input and the table compare equal.
+    """
+    if not moves:
+        return []
+    text = _COMMENT_RE.sub(' ', moves)
+    tokens = []
+    for raw in text.split():
+        token = _MOVE_NUMBER_RE.sub('', raw).rstrip('+#!?')
+        if not token or token in _RESULTS or token.startswith('$'):
+            continue
+        tokens.append(token.replace('0-0-0', 'O-O-O').replace('0-0', 'O-O'))
+    return tokens
+
+def table_checksum():
+    """Content hash of the bundled table; stored classifications are tied to it."""
+    with open(ECO_TABLE_PATH, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _table_signature(path):
+    stat = os.stat(path)
+    return (INDEX_VERSION, stat.st_mtime_ns, stat.st_size)
+
+def _build_index(path):
+    trie = {}
+    entries = set()
+    with open(path, newline='', encoding='utf-8') as f:
+        lines = (line for line in f if not line.startswith('#'))
+        for row in csv.DictReader(lines, delimiter='\t'):
+            node = trie
+            for token in tokenize_moves(row['pgn']):
+                node = node.setdefault(token, {})
+            node[_LEAF] = (row['eco'], row['name'])
+            entries.add((row['name'], row['eco']))
+
+    # One entry per (name, eco) pair, since a name spans several codes
+    # (e.g. "Sicilian Defense" is B20, B27 and B50) and classify stores the pair.
+    # Autocomplete keys: every word start of every name, so "najd" finds
+    # "Sicilian Defense: Najdorf Variation". Sorted for bisect lookups.
+    entries = sorted(entries)
+    completions = []
+    for entry_idx, (name, _) in enumerate(entries):
+        lowered = name.lower()
+        for match in re.finditer(r"[\w']+", lowered):
+            completions.append((lowered[match.start():], entry_idx))
+    completions.sort()
+
+    return {
+        'trie': trie,
+        'entries': entries,
+        'completion_keys': [key for key, _ in completions],
+        'completion_entries': [entry_idx for _, entry_idx in completions],
+    }
+
+def _load_cache(signature):
+    try:
+        with open(ECO_CACHE_PATH, 'rb') as f:
+            cached_signature, index = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+    return index if cached_signature == signature else None
+
+def _write_cache(signature, index):
+    tmp_path = f"{ECO_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((signature, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, ECO_CACHE_PATH)
+    except OSError as e:
+        # Read-only deployments still work, they just rebuild on every start
+        print(f"Could not write ECO cache {ECO_CACHE_PATH}: {e}")
+
+def get_index():
+    """Load the ECO index on first use, from the binary cache when it is current."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                signature = _table_signature(ECO_TABLE_PATH)
+                index = _load_cache(signature)
+                if index is None:
+                    index = _build_index(ECO_TABLE_PATH)
+                    _write_cache(signature, index)
+                _index = index
+    return _index
+
+def classify(moves):
+    """Return (eco_code, canonical_name) for the longest table line the moves start with, or (None, None)."""
+    node = get_index()['trie']
+    best = (None, None)
+    for token in tokenize_moves(moves):
+        node = node.get(token)
+        if node is None:
+            break
+        best = node.get(_LEAF, best)
+    return best
+
+def autocomplete(prefix, limit=10):
+    """(eco, name) pairs whose name has a word starting with prefix, as [{'eco', 'name'}]."""
+    prefix = (prefix or '').strip().lower()
+    if not prefix:
+        return []
+
+    index = get_index()
+    keys = index['completion_keys']
+    results = []
+    seen = set()
+    i = bisect.bisect_left(keys, prefix)
+    while i < len(keys) and keys[i].startswith(prefix) and len(results) < limit:
+        entry_idx = index['completion_entries'][i]
+        if entry_idx not in seen:
+            seen.add(entry_idx)
+            name, eco = index['entries'][entry_idx]
+            results.append({'eco': eco, 'name': name})
+        i += 1
+    return results
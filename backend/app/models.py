@@ -24,8 +24,17 @@ class Opening(db.Model):
     
     # Foreign Key to User (Nullable for Public/Guest openings)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    # Imported openings point at the public opening instead of duplicating its rows.
+    # A private copy of the variations is only made on the first edit (see routes.materialize_opening)
+    source_id = db.Column(db.Integer, db.ForeignKey('opening.id'), nullable=True, index=True)
     
     variations = db.relationship('Variation', backref='opening', lazy=True, cascade="all, delete-orphan")
+    source = db.relationship('Opening', remote_side=[id], backref='references')
+
+    def resolved_variations(self):
+        # References show the public opening's variations until they are materialized
+        return self.source.variations if self.source_id else self.variations
 
     def to_dict(self):
         return {
@@ -36,8 +45,9 @@ class Opening(db.Model):
             'position': self.position, # <--- ADDED
             'updated_at': self.updated_at.isoformat() if self.updated_at else None, # <--- ADDED
             'user_id': self.user_id,
+            'source_id': self.source_id,
             # Sort variations by position, then by ID as fallback
-            'variations': sorted([v.to_dict() for v in self.variations], key=lambda x: (x['position'], x['id']))
+            'variations': sorted([v.to_dict() for v in self.resolved_variations()], key=lambda x: (x['position'], x['id']))
         }
 
 class Variation(db.Model):
@@ -49,6 +59,12 @@ class Variation(db.Model):
     image_filename = db.Column(db.String(200), nullable=True)
     notes = db.Column(db.Text, nullable=True)
     position = db.Column(db.Integer, default=0) # <--- ADDED
+    # Classified from moves on write (see eco.classify); indexed for grouping across users
+    eco_code = db.Column(db.String(3), nullable=True, index=True)
+    eco_name = db.Column(db.String(200), nullable=True, index=True)
+    # Public variation this row was copied from when an imported reference was materialized.
+    # Clients may still hold the public ID, so edits keep resolving to this copy
+    source_variation_id = db.Column(db.Integer, nullable=True, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # <--- ADDED
     
     tutorials = db.relationship('TutorialLink', backref='variation', lazy=True, cascade="all, delete-orphan")
@@ -62,10 +78,17 @@ class Variation(db.Model):
             'image_filename': self.image_filename,
             'notes': self.notes,
             'position': self.position, # <--- ADDED
+            'eco_code': self.eco_code,
+            'eco_name': self.eco_name,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None, # <--- ADDED
             'tutorials': [t.url for t in self.tutorials]
         }
 
+class AppMeta(db.Model):
+    # Small key/value store for deployment state, e.g. which ECO table classified the rows
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(200), nullable=True)
+
 class TutorialLink(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(500), nullable=False)
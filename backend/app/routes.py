@@ -1,17 +1,22 @@
 import os
-import shutil
 import urllib.parse
 import uuid
 import zipfile
 import io
-from flask import Blueprint, request, jsonify, current_app, send_from_directory, session, send_file
+import json
+from flask import Blueprint, request, jsonify, current_app, send_from_directory, session, send_file, Response, stream_with_context
 from flask_login import current_user
 from werkzeug.utils import secure_filename
 from .models import Opening, Variation, TutorialLink, db
-from sqlalchemy import func
+from . import eco, admission_control
+from sqlalchemy import func, select
 
 api = Blueprint('api', __name__)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+EXPORT_FORMATS = {'pgn', 'ndjson'}
+EXPORT_BATCH_SIZE = 500
+DETACH_BATCH_SIZE = 100
+AUTOCOMPLETE_MAX_LIMIT = 25
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -49,6 +54,96 @@ def remove_variation_image(variation):
                 except Exception as e:
                     print(f"Error deleting file {file_path}: {e}")
 
+def materialize_opening(opening):
+    """
+    Copy-on-write for imported openings.
+    Turns a reference to a public opening into a private copy of its variations
+    and tutorials. Returns {public_variation_id: copied_variation}.
+    """
+    if opening.source_id is None:
+        return {}
+
+    copies = {}
+    pub_vars_sorted = sorted(opening.source.variations, key=lambda v: (v.position or 0, v.id))
+    for i, pub_var in enumerate(pub_vars_sorted):
+        new_var = Variation(
+            name=pub_var.name,
+            moves=pub_var.moves,
+            lichess_link=pub_var.lichess_link,
+            # Image files are shared; remove_variation_image only deletes the last user
+            image_filename=pub_var.image_filename,
+            notes=pub_var.notes,
+            position=i, # Maintain relative order
+            eco_code=pub_var.eco_code,
+            eco_name=pub_var.eco_name,
+            source_variation_id=pub_var.id,
+            tutorials=[TutorialLink(url=t.url) for t in pub_var.tutorials]
+        )
+        opening.variations.append(new_var)
+        copies[pub_var.id] = new_var
+
+    opening.source = None
+    db.session.flush() # Assign IDs to the copies
+    return copies
+
+def detach_references(opening):
+    """
+    Materialize user references before a public opening is deleted.
+    References are live views, so admin edits to a public opening's variations
+    show up in unedited imports; deletion is the one change that would lose
+    user data. Runs in batches, committing each, to keep transactions bounded.
+    """
+    if opening.user_id is not None:
+        return
+    while True:
+        refs = Opening.query.filter_by(source_id=opening.id).limit(DETACH_BATCH_SIZE).all()
+        if not refs:
+            break
+        for ref in refs:
+            materialize_opening(ref)
+        db.session.commit()
+
+def find_user_reference(variation, opening_id=None):
+    """
+    Find what stands for a public variation in the current user's repertoire:
+    (reference_opening, None) while unmaterialized, (None, copied_variation) after.
+    opening_id narrows it to the opening the client is editing. Without it the
+    match must be unique; ambiguous or missing matches return (None, None).
+    """
+    refs = Opening.query.filter_by(user_id=current_user.id, source_id=variation.opening_id)
+    copies = Variation.query.join(Opening).filter(
+        Opening.user_id == current_user.id,
+        Variation.source_variation_id == variation.id
+    )
+    if opening_id is not None:
+        refs = refs.filter(Opening.id == opening_id)
+        copies = copies.filter(Variation.opening_id == opening_id)
+
+    refs = refs.limit(2).all()
+    copies = copies.limit(2).all()
+    if len(refs) + len(copies) != 1:
+        return None, None
+    return (refs[0], None) if refs else (None, copies[0])
+
+def resolve_variations_for_edit(variations, opening_id=None):
+    """
+    Variations of an imported reference are served with their public IDs.
+    When the user edits one, materialize their reference and return the private
+    copies instead. Public IDs of an already materialized reference map to the
+    user's copy. Variations the user can already edit are returned unchanged.
+    """
+    copies = {}
+    resolved = []
+    for variation in variations:
+        if variation.id not in copies and current_user.is_authenticated and not has_edit_permission(variation.opening):
+            ref, copy = find_user_reference(variation, opening_id)
+            if ref:
+                copies.update(materialize_opening(ref))
+            elif copy:
+                copies[variation.id] = copy
+        resolved.append(copies.get(variation.id, variation))
+    return resolved
+
 # --- GET: Fetch openings (Public vs Private) ---
 @api.route('/openings', methods=['GET'])
 def get_openings():
@@ -75,6 +170,7 @@ def get_openings():
 
 # --- POST: Reorder Openings ---
 @api.route('/openings/reorder', methods=['POST'])
+@admission_control.rate_limit('write')
 def reorder_openings():
     # Only allow if logged in or admin
     if not current_user.is_authenticated and not session.get('is_admin_mode', False):
@@ -114,6 +210,7 @@ def reorder_openings():
 
 # --- POST: Reorder Variations ---
 @api.route('/variations/reorder', methods=['POST'])
+@admission_control.rate_limit('write')
 def reorder_variations():
     # Only allow if logged in or admin
     if not current_user.is_authenticated and not session.get('is_admin_mode', False):
@@ -126,7 +223,9 @@ def reorder_variations():
         return jsonify({'status': 'success'})
 
     variations = Variation.query.filter(Variation.id.in_(ordered_ids)).all()
-    variation_map = {v.id: v for v in variations}
+    # IDs may point at public variations seen through an imported reference
+    resolved = resolve_variations_for_edit(variations, data.get('opening_id'))
+    variation_map = {v.id: r for v, r in zip(variations, resolved)}
 
     first = variation_map.get(ordered_ids[0])
     if not first:
@@ -151,6 +250,7 @@ def reorder_variations():
 
 # --- POST: Toggle Favorite ---
 @api.route('/openings/<int:id>/favorite', methods=['POST'])
+@admission_control.rate_limit('write')
 def toggle_favorite(id):
     opening = Opening.query.get_or_404(id)
     if not has_edit_permission(opening):
@@ -162,6 +262,8 @@ def toggle_favorite(id):
 
 # --- POST: Import Openings ---
 @api.route('/import', methods=['POST'])
+@admission_control.rate_limit('write')
+@admission_control.limit_concurrency('import')
 def import_openings():
     if not current_user.is_authenticated:
         return jsonify({'error': 'Must be logged in to import'}), 401
@@ -175,8 +277,6 @@ def import_openings():
     ).order_by(Opening.position.asc(), Opening.id.asc()).all()
     
     count = 0
-    upload_folder = os.path.join(current_app.root_path, '..', 'uploads')
-    os.makedirs(upload_folder, exist_ok=True)
 
     # Determine next available position PER SIDE (so white/black don't collide)
     next_pos_by_side = {}
@@ -185,7 +285,7 @@ def import_openings():
         next_pos_by_side[side] = (max_pos + 1) if max_pos is not None else 0
 
     for pub_op in public_openings:
-        # Create Opening Copy
+        # Create a reference to the public opening; variations are copied on first edit
         existing_user_op = Opening.query.filter_by(
             user_id=current_user.id,
             name=pub_op.name,
@@ -194,52 +294,26 @@ def import_openings():
 
         if existing_user_op:
             continue
+
+        # Skip openings already imported under another name, referenced or materialized
+        already_referenced = Opening.query.filter_by(user_id=current_user.id, source_id=pub_op.id).first()
+        already_copied = Variation.query.join(Opening).filter(
+            Opening.user_id == current_user.id,
+            Variation.source_variation_id.in_([v.id for v in pub_op.variations])
+        ).first() if pub_op.variations else None
+        if already_referenced or already_copied:
+            continue
             
         new_op = Opening(
             name=pub_op.name, 
             side=pub_op.side, 
             user_id=current_user.id,
+            source_id=pub_op.id,
             position=next_pos_by_side.get(pub_op.side, 0) # Set position per side
         )
         next_pos_by_side[pub_op.side] = next_pos_by_side.get(pub_op.side, 0) + 1
 
         db.session.add(new_op)
-        db.session.commit() # Commit to get ID
-        
-        pub_vars_sorted = sorted(pub_op.variations, key=lambda v: (v.position or 0, v.id))
-        for i, pub_var in enumerate(pub_vars_sorted):
-            # Handle Image Copying (to avoid deleting shared images later)
-            new_image_filename = None
-            if pub_var.image_filename:
-                # Generate new unique name for the user's copy
-                ext = pub_var.image_filename.split('.')[-1]
-                unique_name = f"img_{uuid.uuid4().hex}.{ext}"
-                # Use same 'u' prefix convention as regular uploads
-                new_image_filename = f"u{current_user.id}_{unique_name}"
-                
-                src_path = os.path.join(upload_folder, pub_var.image_filename)
-                dst_path = os.path.join(upload_folder, new_image_filename)
-                
-                if os.path.exists(src_path):
-                    shutil.copy2(src_path, dst_path)
-            
-            new_var = Variation(
-                opening_id=new_op.id,
-                name=pub_var.name,
-                moves=pub_var.moves,
-                lichess_link=pub_var.lichess_link,
-                image_filename=new_image_filename,
-                notes=pub_var.notes,
-                position=i # Maintain relative order
-            )
-            db.session.add(new_var)
-            db.session.commit()
-            
-            # Copy Tutorials
-            for pub_tut in pub_var.tutorials:
-                new_tut = TutorialLink(url=pub_tut.url, variation_id=new_var.id)
-                db.session.add(new_tut)
-        
         count += 1
     
     db.session.commit()
@@ -247,6 +321,7 @@ def import_openings():
 
 # --- POST: Add Opening ---
 @api.route('/openings', methods=['POST'])
+@admission_control.rate_limit('write')
 def add_opening():
     if not has_edit_permission():
         return jsonify({'error': 'Permission denied. Login or enter admin password.'}), 403
@@ -269,6 +344,9 @@ def add_opening():
     opening = Opening.query.filter_by(name=name, side=side, user_id=owner_id).first()
 
     if opening:
+        # Adding to an imported reference turns it into a private copy first
+        materialize_opening(opening)
+
         # Opening exists, check for duplicate variation/moves
         existing_variation = Variation.query.filter_by(opening_id=opening.id, name=variation_name).first()
         if existing_variation:
@@ -308,6 +386,8 @@ def add_opening():
     max_var_pos = db.session.query(func.max(Variation.position)).filter_by(opening_id=opening.id).scalar()
     new_var_pos = (max_var_pos + 1) if max_var_pos is not None else 0
 
+    eco_code, eco_name = eco.classify(moves)
+
     new_variation = Variation(
         opening_id=opening.id,
         name=variation_name,
@@ -315,7 +395,9 @@ def add_opening():
         lichess_link=generated_lichess_link,
         image_filename=image_filename,
         notes=notes,
-        position=new_var_pos
+        position=new_var_pos,
+        eco_code=eco_code,
+        eco_name=eco_name
     )
     
     db.session.add(new_variation)
@@ -331,6 +413,7 @@ def add_opening():
 
 # --- PUT: Update Opening Name ---
 @api.route('/openings/<int:id>', methods=['PUT'])
+@admission_control.rate_limit('write')
 def update_opening(id):
     opening = Opening.query.get_or_404(id)
     if not has_edit_permission(opening):
@@ -352,8 +435,10 @@ def update_opening(id):
 
 # --- PUT: Update Variation ---
 @api.route('/variations/<int:id>', methods=['PUT'])
+@admission_control.rate_limit('write')
 def update_variation(id):
-    variation = Variation.query.get_or_404(id)
+    opening_id = request.form.get('opening_id', type=int)
+    variation = resolve_variations_for_edit([Variation.query.get_or_404(id)], opening_id)[0]
     if not has_edit_permission(variation.opening):
         return jsonify({'error': 'Permission denied'}), 403
     
@@ -376,6 +461,7 @@ def update_variation(id):
     if variation_name: variation.name = variation_name
     variation.moves = moves
     variation.notes = notes
+    variation.eco_code, variation.eco_name = eco.classify(moves)
     encoded_pgn = urllib.parse.quote(moves)
     variation.lichess_link = f"https://lichess.org/analysis/pgn/{encoded_pgn}"
 
@@ -411,11 +497,13 @@ def update_variation(id):
 
 # --- DELETE Operations ---
 @api.route('/openings/<int:id>', methods=['DELETE'])
+@admission_control.rate_limit('write')
 def delete_opening(id):
     opening = Opening.query.get_or_404(id)
     if not has_edit_permission(opening):
         return jsonify({'error': 'Permission denied'}), 403
         
+    detach_references(opening)
     for variation in opening.variations:
         remove_variation_image(variation)        
     db.session.delete(opening)
@@ -423,8 +511,10 @@ def delete_opening(id):
     return jsonify({'message': 'Deleted successfully'})
 
 @api.route('/variations/<int:id>', methods=['DELETE'])
+@admission_control.rate_limit('write')
 def delete_variation(id):
-    variation = Variation.query.get_or_404(id)
+    opening_id = request.args.get('opening_id', type=int)
+    variation = resolve_variations_for_edit([Variation.query.get_or_404(id)], opening_id)[0]
     if not has_edit_permission(variation.opening):
         return jsonify({'error': 'Permission denied'}), 403
 
@@ -434,6 +524,7 @@ def delete_variation(id):
     return jsonify({'message': 'Deleted successfully'})
 
 @api.route('/batch-delete', methods=['POST'])
+@admission_control.rate_limit('write')
 def batch_delete():
     data = request.get_json()
     opening_ids = data.get('openings', [])
@@ -443,7 +534,7 @@ def batch_delete():
     try:
         if variation_ids:
             variations = Variation.query.filter(Variation.id.in_(variation_ids)).all()
-            for v in variations:
+            for v in resolve_variations_for_edit(variations):
                 if has_edit_permission(v.opening):
                     remove_variation_image(v)
                     db.session.delete(v)
@@ -452,6 +543,7 @@ def batch_delete():
             openings = Opening.query.filter(Opening.id.in_(opening_ids)).all()
             for op in openings:
                 if has_edit_permission(op):
+                    detach_references(op)
                     for v in op.variations:
                         remove_variation_image(v)
                     db.session.delete(op)
@@ -467,8 +559,16 @@ def serve_image(filename):
     upload_folder = os.path.join(current_app.root_path, '..', 'uploads')
     return send_from_directory(upload_folder, filename)
 
+# --- GET: ECO opening name autocomplete ---
+@api.route('/eco/autocomplete', methods=['GET'])
+def eco_autocomplete():
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), AUTOCOMPLETE_MAX_LIMIT)
+    return jsonify(eco.autocomplete(query, limit=max(limit, 1)))
+
 # --- GET: Admin Export Backup ---
 @api.route('/admin/export-backup', methods=['GET'])
+@admission_control.limit_concurrency('export_backup')
 def export_backup():
     # Only allow if in Admin Mode (guest + admin pass)
     if not session.get('is_admin_mode', False):
@@ -514,3 +614,119 @@ def export_backup():
         as_attachment=True,
         download_name='chess_backup.zip'
     )
+
+
+# --- Repertoire export helpers ---
+def _export_order():
+    # Same order the dashboard shows: per side, then opening position, then variation position
+    return (Opening.side.asc(), Opening.position.asc(), Opening.id.asc(),
+            Variation.position.asc(), Variation.id.asc())
+
+def iter_export_rows(user_id):
+    """
+    Yield (variation_row, tutorial_urls) for every variation owned by user_id,
+    including the public variations behind imported references.
+    Both queries run on server-side cursors in the same order, so tutorials are
+    merged in without loading the whole repertoire into memory.
+    """
+    variation_stmt = (
+        select(
+            Opening.name.label('opening_name'), Opening.side,
+            Variation.id, Variation.name, Variation.moves, Variation.lichess_link,
+            Variation.notes, Variation.position, Variation.eco_code, Variation.eco_name,
+        )
+        .join(Opening, Variation.opening_id == func.coalesce(Opening.source_id, Opening.id))
+        .filter(Opening.user_id == user_id)
+        .order_by(*_export_order())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    tutorial_stmt = (
+        select(TutorialLink.variation_id, TutorialLink.url)
+        .join(Variation, TutorialLink.variation_id == Variation.id)
+        .join(Opening, Variation.opening_id == func.coalesce(Opening.source_id, Opening.id))
+        .filter(Opening.user_id == user_id)
+        .order_by(*_export_order(), TutorialLink.id.asc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    tutorials = iter(db.session.execute(tutorial_stmt))
+    pending = next(tutorials, None)
+
+    for row in db.session.execute(variation_stmt):
+        urls = []
+        while pending is not None and pending.variation_id == row.id:
+            urls.append(pending.url)
+            pending = next(tutorials, None)
+        yield row, urls
+
+def _pgn_tag(value):
+    return str(value or '').replace('\\', '\\\\').replace('"', '\\"')
+
+def _pgn_comment(text):
+    # Braces would terminate the comment early
+    return text.replace('{', '(').replace('}', ')').strip()
+
+def format_pgn_game(row, tutorial_urls):
+    tags = [
+        ('Event', f"{row.opening_name}: {row.name}"),
+        ('Site', row.lichess_link),
+        ('Date', '????.??.??'),
+        ('Round', '-'),
+        ('White', '?'),
+        ('Black', '?'),
+        ('Result', '*'),
+        ('ECO', row.eco_code or '?'),
+        ('Opening', row.opening_name),
+        ('Variation', row.name),
+        ('Side', row.side),
+    ]
+    lines = [f'[{key} "{_pgn_tag(value)}"]' for key, value in tags]
+
+    comments = []
+    if row.notes and row.notes.strip():
+        comments.append(_pgn_comment(row.notes))
+    for url in tutorial_urls:
+        comments.append(_pgn_comment(f"Tutorial: {url}"))
+
+    movetext = ' '.join([f"{{{c}}}" for c in comments] + [row.moves.strip(), '*'])
+    return '\n'.join(lines) + '\n\n' + movetext + '\n\n'
+
+def format_ndjson_line(row, tutorial_urls):
+    return json.dumps({
+        'opening': row.opening_name,
+        'side': row.side,
+        'variation_id': row.id,
+        'name': row.name,
+        'moves': row.moves,
+        'lichess_link': row.lichess_link,
+        'notes': row.notes,
+        'position': row.position,
+        'eco_code': row.eco_code,
+        'eco_name': row.eco_name,
+        'tutorials': tutorial_urls,
+    }) + '\n'
+
+# --- GET: Export current user's repertoire (PGN / NDJSON) ---
+@api.route('/export', methods=['GET'])
+@admission_control.limit_concurrency('export')
+def export_repertoire():
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Must be logged in to export'}), 401
+
+    export_format = request.args.get('format', 'pgn').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format '{export_format}'. Use 'pgn' or 'ndjson'."}), 400
+
+    formatter = format_pgn_game if export_format == 'pgn' else format_ndjson_line
+    mimetype = 'application/x-chess-pgn' if export_format == 'pgn' else 'application/x-ndjson'
+    user_id = current_user.id
+
+    def generate():
+        for row, tutorial_urls in iter_export_rows(user_id):
+            yield formatter(row, tutorial_urls)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=repertoire.{export_format}'}
+    )
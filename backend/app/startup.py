@@ -0,0 +1,167 @@
+import hashlib
+import os
+import time
+from sqlalchemy import bindparam, inspect, select, text, update
+from . import db, eco
+
+SCHEMA_MARKER = 'schema.verified'
+ECO_TABLE_META_KEY = 'eco_table_checksum'
+CLASSIFY_BATCH_SIZE = 500
+
+def schema_fingerprint(app):
+    """Hash of the models' tables/columns plus the database URI."""
+    parts = [app.config['SQLALCHEMY_DATABASE_URI']]
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(table.name + ':' + ','.join(sorted(c.name for c in table.columns)))
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+def _sqlite_file_missing(app):
+    # A deleted SQLite file invalidates the marker even though the models did not change
+    with app.app_context():
+        url = db.engine.url
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:') \
+        and not os.path.exists(url.database)
+
+def classify_variations():
+    """
+    Fill ECO code and name for every variation from its moves. Returns how many
+    rows changed. Uses Core updates in id-ordered batches and keeps updated_at
+    as it was, since a reclassification is not a user edit.
+    """
+    from .models import Variation
+    table = Variation.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('row_id'))
+        # Pin updated_at, otherwise its onupdate fires
+        .values(eco_code=bindparam('new_code'), eco_name=bindparam('new_name'), updated_at=table.c.updated_at)
+    )
+
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.moves, table.c.eco_code, table.c.eco_name)
+            .where(table.c.id > last_id).order_by(table.c.id).limit(CLASSIFY_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            code, name = eco.classify(row.moves)
+            if (code, name) != (row.eco_code, row.eco_name):
+                params.append({'row_id': row.id, 'new_code': code, 'new_name': name})
+        if params:
+            db.session.execute(stmt, params)
+            db.session.commit()
+            changed += len(params)
+        last_id = rows[-1].id
+    return changed
+
+def sync_eco_classification():
+    """
+    Reclassify all variations when the ECO table differs from the one the stored
+    codes came from (including the first run after the columns were added).
+    """
+    from .models import AppMeta
+    checksum = eco.table_checksum()
+    meta = db.session.get(AppMeta, ECO_TABLE_META_KEY)
+    if meta is not None and meta.value == checksum:
+        return
+
+    print(f"ECO table changed, updated classification of {classify_variations()} variations.")
+    if meta is None:
+        meta = AppMeta(key=ECO_TABLE_META_KEY)
+        db.session.add(meta)
+    meta.value = checksum
+    db.session.commit()
+
+def _add_column(conn, table, column):
+    # Only nullable columns can be added to tables that already have rows
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+    conn.execute(text(ddl))
+    for index in table.indexes:
+        if column.name in index.columns:
+            index.create(conn, checkfirst=True)
+
+def upgrade_columns():
+    """
+    create_all does not alter existing tables. Add nullable model columns the
+    database lacks (with their indexes). Safe to run repeatedly. Returns the columns that could not be added.
+    """
+    added, missing = [], []
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in db.metadata.tables.values():
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                name = f"{table.name}.{column.name}"
+                if column.nullable and not column.primary_key:
+                    _add_column(conn, table, column)
+                    added.append(name)
+                else:
+                    missing.append(name)
+
+    if added:
+        print(f"Added database columns: {', '.join(added)}")
+    return missing
+
+def ensure_schema(app):
+    """
+    Create missing tables and add missing nullable columns, then check every
+    model column exists in the database. Once verified, a marker with the schema
+    fingerprint is written to the instance folder and later launches skip the
+    check until the models change. Stored ECO codes are brought in line with the
+    bundled table on every launch (a no-op unless the table changed).
+    """
+    fingerprint = schema_fingerprint(app)
+    marker_path = os.path.join(app.instance_path, SCHEMA_MARKER)
+
+    try:
+        with open(marker_path) as f:
+            verified = f.read().strip() == fingerprint and not _sqlite_file_missing(app)
+    except OSError:
+        verified = False
+
+    if not verified:
+        with app.app_context():
+            db.create_all()
+            missing = upgrade_columns()
+
+        if missing:
+            print(f"Database schema is missing columns: {', '.join(missing)}")
+            return False
+
+        os.makedirs(app.instance_path, exist_ok=True)
+        with open(marker_path, 'w') as f:
+            f.write(fingerprint)
+
+    with app.app_context():
+        sync_eco_classification()
+    return True
+
+def warm_up(app):
+    """
+    Prime process-wide caches. Call before forking workers so they share the result.
+    Returns the time taken in seconds.
+    """
+    start = time.perf_counter()
+    eco.get_index()
+    return time.perf_counter() - start
+
+def warm_up_worker(app):
+    """
+    Per-worker warm-up after fork: drop connections inherited from the parent and
+    open a fresh one, so the first request does not pay for connecting.
+    Returns the time taken in seconds.
+    """
+    start = time.perf_counter()
+    with app.app_context():
+        db.engine.dispose(close=False)
+        with db.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    return time.perf_counter() - start
@@ -0,0 +1,50 @@
+# Production server config. Run from backend/:  gunicorn
+# Graceful reload: kill -HUP <master pid> replaces workers without dropping requests.
+# Because the app is preloaded in the master, picking up new code needs a binary
+# upgrade instead: kill -USR2 <master pid>, then kill -TERM <old master pid>.
+import multiprocessing
+import os
+import sys
+import time
+
+MASTER_START = time.time()
+
+wsgi_app = 'run:app'
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+# Admission limits (app/admission.py) read the same variable, keep expensive
+# endpoints below this per worker, and apply per worker process.
+# Must be at least 2 so one thread stays free for reads; the app refuses to start otherwise
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app once in the master; workers fork with modules and caches already loaded
+preload_app = True
+
+def on_starting(server):
+    from run import app
+    from app.startup import ensure_schema, warm_up
+
+    if not ensure_schema(app):
+        # Workers would fail every request against this database; refuse to serve
+        server.log.error("Database schema check failed, not starting")
+        sys.exit(1)
+    server.log.info("Master warm-up took %.3fs", warm_up(app))
+
+def when_ready(server):
+    server.log.info("Master ready in %.3fs", time.time() - MASTER_START)
+
+def post_fork(server, worker):
+    from run import app
+    from app.startup import warm_up_worker
+
+    worker.first_request_served = False
+    server.log.info("Worker %s warm-up took %.3fs", worker.pid, warm_up_worker(app))
+
+def post_request(worker, req, environ, resp):
+    if not worker.first_request_served:
+        worker.first_request_served = True
+        worker.log.info("Worker %s served first request %.3fs after master start", worker.pid, time.time() - MASTER_START)
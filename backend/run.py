@@ -1,18 +1,25 @@
-from app import create_app, db
+import sys
+from app import create_app
+from app.startup import ensure_schema, classify_variations
 
 # Create the application instance
 app = create_app()
 
 @app.cli.command('init-db')
 def init_db_command():
-    """Initializes and populates the database."""
-    with app.app_context():
-        db.create_all()
-        # Add initial data here for testing
+    """Initializes the database, or upgrades an existing one to the current models."""
+    if ensure_schema(app):
         print('Initialized the database.')
 
-if __name__ == '__main__':
-    # Add this to ensure the database file is created when you run it
+@app.cli.command('classify-eco')
+def classify_eco_command():
+    """Fills ECO code and name for every variation from its moves."""
     with app.app_context():
-        db.create_all()
+        print(f'Updated ECO classification of {classify_variations()} variations.')
+
+if __name__ == '__main__':
+    # Dev server only; production uses gunicorn (see gunicorn.conf.py)
+    # Creates the database on first run, skipped once the schema is verified
+    if not ensure_schema(app):
+        sys.exit('Database schema check failed')
     app.run(debug=True)
\ No newline at end of file
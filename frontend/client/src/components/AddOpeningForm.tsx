@@ -8,6 +8,7 @@ interface AddOpeningFormProps {
   onCancel: () => void;
   initialOpeningName?: string;
   initialSide?: 'white' | 'black';
+  initialOpeningId?: number; // Opening the variation is edited from (imports share public variation IDs)
   initialVariationData?: Variation; // If provided, we are in Edit Mode
 }
 
@@ -16,6 +17,7 @@ const AddOpeningForm: React.FC<AddOpeningFormProps> = ({
   onCancel, 
   initialOpeningName, 
   initialSide,
+  initialOpeningId,
   initialVariationData
 }) => {
   const isEditMode = !!initialVariationData;
@@ -141,6 +143,7 @@ const AddOpeningForm: React.FC<AddOpeningFormProps> = ({
     try {
       if (isEditMode && initialVariationData) {
         // PUT Request
+        if (initialOpeningId) formData.append('opening_id', String(initialOpeningId));
         await axios.put(`/api/variations/${initialVariationData.id}`, formData, {
             headers: { 'Content-Type': 'multipart/form-data' },
             withCredentials: true,
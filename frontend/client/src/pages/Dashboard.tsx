@@ -33,7 +33,7 @@ function Dashboard() {
   const [selectedVariation, setSelectedVariation] = useState<{name: string, data: Variation, openingData: Opening} | null>(null);
   const [isDetailsOpen, setIsDetailsOpen] = useState(false);
   const [isDeleteWarningOpen, setIsDeleteWarningOpen] = useState(false);
-  const [itemsToDelete, setItemsToDelete] = useState<{openings: number[], variations: number[]} | null>(null);
+  const [itemsToDelete, setItemsToDelete] = useState<{openings: number[], variations: number[], openingId?: number} | null>(null);
 
   // New Modals
   const [isAdminGuardOpen, setIsAdminGuardOpen] = useState(false);
@@ -89,7 +89,7 @@ function Dashboard() {
 
       // 2. Persist
       try {
-          await axios.post('/api/variations/reorder', { ids: newVariations.map(v => v.id) }, { withCredentials: true });
+          await axios.post('/api/variations/reorder', { ids: newVariations.map(v => v.id), opening_id: openingId }, { withCredentials: true });
       } catch (e) {
           console.error("Reorder variations failed", e);
           fetchOpenings();
@@ -216,7 +216,7 @@ function Dashboard() {
           if (itemsToDelete.openings.length === 1 && itemsToDelete.variations.length === 0) {
               await axios.delete(`/api/openings/${itemsToDelete.openings[0]}`, { withCredentials: true });
           } else if (itemsToDelete.openings.length === 0 && itemsToDelete.variations.length === 1) {
-               await axios.delete(`/api/variations/${itemsToDelete.variations[0]}`, { withCredentials: true });
+               await axios.delete(`/api/variations/${itemsToDelete.variations[0]}`, { params: { opening_id: itemsToDelete.openingId }, withCredentials: true });
           } else {
               await axios.post('/api/batch-delete', itemsToDelete, { withCredentials: true });
           }
@@ -242,7 +242,9 @@ function Dashboard() {
 
   const requestDeleteVariation = (_openingName: string, variation: Variation) => {
       requirePermission(() => {
-        setItemsToDelete({ openings: [], variations: [variation.id] });
+        // Imported openings share variation IDs with the public opening, so say which opening this is
+        const parent = openings.find(o => o.variations.some(v => v.id === variation.id));
+        setItemsToDelete({ openings: [], variations: [variation.id], openingId: parent?.id });
         setIsDeleteWarningOpen(true);
       });
   };
@@ -540,7 +542,7 @@ function Dashboard() {
 
       {/* --- Modals --- */}
       <Modal isOpen={isModalOpen} onClose={() => setIsModalOpen(false)} title={editingVariation ? "Edit Variation" : editingOpening ? `Add to ${editingOpening.name}` : "New Opening"}>
-        <AddOpeningForm onSuccess={() => { setIsModalOpen(false); fetchOpenings(); }} onCancel={() => setIsModalOpen(false)} initialOpeningName={editingOpening?.name} initialSide={editingOpening?.side} initialVariationData={editingVariation || undefined} />
+        <AddOpeningForm onSuccess={() => { setIsModalOpen(false); fetchOpenings(); }} onCancel={() => setIsModalOpen(false)} initialOpeningName={editingOpening?.name} initialSide={editingOpening?.side} initialOpeningId={editingOpening?.id} initialVariationData={editingVariation || undefined} />
       </Modal>
 
       <Modal isOpen={isRenameModalOpen} onClose={() => setIsRenameModalOpen(false)} title="Rename Opening">